@@ -1,8 +1,10 @@
 import streamlit as st
+import asyncio
 import base64
 import os
 import sys
 import smtplib
+import threading
 
 
 server_path = os.path.join(os.path.dirname(__file__), '..', 'server')
@@ -10,10 +12,20 @@ sys.path.append(server_path)
 
 
 from input_processing import DocumentProcessor
-from text_embedding_and_vector_storage import VectorStore
 from cover_letter_generator import GroqCoverLetterGenerator
 
 
+@st.cache_resource
+def get_event_loop():
+    # One loop for the process so the generator's pooled Groq connections stay usable
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+@st.cache_resource
+def get_generator():
+    return GroqCoverLetterGenerator(groq_api_key=os.getenv('GROQ_API_KEY'))
 
 
 def switch_to_guide():
@@ -61,16 +73,11 @@ if st.session_state.page == 'main':
             processor = DocumentProcessor()
             processor.process_documents(resume_path)
 
-            vector_store = VectorStore()
-            stores = vector_store.process_documents(
-                "data/resume.txt",
-                "data/job_description.txt"
-            )
             with open("data/resume.txt", "r") as f:
                 resume_text = f.read()
 
-            generator = GroqCoverLetterGenerator(groq_api_key=os.getenv('GROQ_API_KEY'))
-            # Create or load vector stores
+            generator = get_generator()
+            # Create or load vector stores; they are rebuilt only when the text changed
             resume_store = generator.load_or_create_vector_store(
                 resume_text, 
                 "resume_store"
@@ -79,10 +86,28 @@ if st.session_state.page == 'main':
                 job_description, 
                 "jd_store"
             )
-            cover_letter = generator.generate_cover_letter(resume_store=resume_store, jd_store=jd_store, hr_email=mail)
 
-            # Save generated email in session state
-            st.session_state.content = cover_letter
+            def stream_cover_letter():
+                # Drive the async token stream on the shared loop from Streamlit's synchronous script
+                loop = get_event_loop()
+                tokens = generator.generate_cover_letter(resume_store=resume_store, jd_store=jd_store, hr_email=mail)
+                try:
+                    while True:
+                        try:
+                            yield asyncio.run_coroutine_threadsafe(tokens.__anext__(), loop).result()
+                        except StopAsyncIteration:
+                            break
+                finally:
+                    asyncio.run_coroutine_threadsafe(tokens.aclose(), loop).result()
+
+            # Show tokens as they arrive; write_stream returns the full text
+            try:
+                cover_letter = st.write_stream(stream_cover_letter())
+            except Exception as e:
+                st.error(f"Error generating cover letter: {e}")
+            else:
+                # Save generated email in session state
+                st.session_state.content = cover_letter
 
     # Text area for displaying and modifying the email
     def update_content():
@@ -1,12 +1,110 @@
 import groq
-from typing import Optional, Dict
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Tuple
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+import asyncio
+from collections import OrderedDict
+from disk_docstore import DiskDocstore
+from embedding_model import MPNetEmbeddings
+from query_cache import QueryCache
+import faiss
+import functools
+import hashlib
+import httpx
+import itertools
+import numpy as np
 import os
+import shutil
+import threading
+import weakref
+
+EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+DEFAULT_INDEX_FACTORY = "HNSW32,SQfp16"
+# Distinct from FAISS.save_local's index.faiss, which VectorStore writes to the same directories
+INDEX_FILE = "vectors.faiss"
+
+_embedder_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def _load_embedder(model_name: str, quantize: bool) -> MPNetEmbeddings:
+    return MPNetEmbeddings(model_name=model_name, batch_size=32, quantize=quantize)
+
+def _get_embedder(model_name: str, quantize: bool) -> MPNetEmbeddings:
+    """Return the embedder shared by all generator instances, loading it on first use"""
+    with _embedder_lock:
+        return _load_embedder(model_name, quantize)
+
+def _warmup_embedder() -> None:
+    """Load the embedder and run one query so the first request doesn't pay for it"""
+    try:
+        _get_embedder(EMBEDDING_MODEL, True).embed_query("warmup")
+    except Exception as e:
+        print(f"Error warming up embeddings model: {e}")
+
+threading.Thread(target=_warmup_embedder, daemon=True).start()
+
+# Live vector stores by path with the hash of their text and index type, least
+# recently used first. _store_lock only guards the dict; loading or building a
+# store holds the lock for its path so other stores aren't blocked
+_store_lock = threading.Lock()
+_store_cache: "OrderedDict[str, Tuple[str, FAISS]]" = OrderedDict()
+_store_path_locks: Dict[str, threading.Lock] = {}
+MAX_CACHED_STORES = 32
+
+# Identity of each live vector store for context cache keys. Unlike id(), a token is
+# never reused by a later store; stores saved by this class share their
+# (store_path, source_hash) token across reloads since their content is the same
+_store_tokens: "weakref.WeakKeyDictionary[FAISS, Hashable]" = weakref.WeakKeyDictionary()
+_store_token_lock = threading.Lock()
+_store_token_counter = itertools.count()
+
+def _store_token(vector_store: FAISS) -> Hashable:
+    """Return the cache identity of a vector store, assigning a fresh one on first use"""
+    with _store_token_lock:
+        token = _store_tokens.get(vector_store)
+        if token is None:
+            token = ("anonymous", next(_store_token_counter))
+            _store_tokens[vector_store] = token
+        return token
+
+CHUNK_SIZE = 500
+
+def _make_text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=50,
+        separators=["\n\n", "\n", " ", ""]
+    )
+
+_text_splitter = _make_text_splitter()
+
+@functools.lru_cache(maxsize=256)
+def _split(text: str) -> Tuple[str, ...]:
+    """
+    Split text into chunks, caching results for repeated inputs and
+    skipping the splitter for text that already fits in one chunk
+    """
+    if len(text) <= CHUNK_SIZE:
+        return (text.strip(),) if text.strip() else ()
+    return tuple(_text_splitter.split_text(text))
 
 class GroqCoverLetterGenerator:
+    # Fixed extraction queries; resume queries first, then job description queries
+    _QUERIES = {
+        "technical_skills": "What are the candidate's technical skills, programming languages, and tools?",
+        "soft_skills": "What are the candidate's soft skills, leadership abilities, and interpersonal skills?",
+        "experience": "What are the candidate's most relevant work experiences, projects, and achievements?",
+        "education": "What is the candidate's educational background, degrees, and certifications?",
+        "job_requirements": "What are the key technical requirements and qualifications for this position?",
+        "job_responsibilities": "What are the main responsibilities and duties of this role?"
+    }
+    _RESUME_KEYS = ['technical_skills', 'soft_skills', 'experience', 'education']
+    _JD_KEYS = ['job_requirements', 'job_responsibilities']
+    # Chunks retrieved per fixed query; the prompt uses the top 3, match scoring the top 5
+    _RETRIEVE_K = 5
+    
     def __init__(self, groq_api_key: str, vector_store_path: str = "vector_indices"):
         """
         Initialize the Groq-based cover letter generator
@@ -15,47 +113,220 @@ class GroqCoverLetterGenerator:
             groq_api_key: API key for Groq
             vector_store_path: Path where vector stores are saved
         """
-        self.client = groq.Client(api_key=groq_api_key)
+        # Keep TLS connections to Groq alive across requests
+        self._http = httpx.AsyncClient(
+            http2=True,
+            timeout=30,
+            limits=httpx.Limits(max_keepalive_connections=20)
+        )
+        self.client = groq.AsyncClient(api_key=groq_api_key, http_client=self._http)
         self.vector_store_path = vector_store_path
         
-        # Initialize embeddings model
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-mpnet-base-v2"
-        )
+        # Shared embeddings model (int8 weights, fp32 pooling)
+        self.embeddings = _get_embedder(EMBEDDING_MODEL, True)
         
         # Initialize text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        self.text_splitter = _make_text_splitter()
+        
+        # Cache retrieved context per (store token, query, k) and query embeddings per query text
+        self._ctx_cache = QueryCache(max_size=2048, ttl_seconds=600)
+        self._embed_cache = QueryCache(max_size=2048, ttl_seconds=600)
+    
+    async def aclose(self) -> None:
+        """
+        Close the pooled HTTP connections to Groq
+        """
+        await self._http.aclose()
     
     def load_or_create_vector_store(self, 
                                 text: str, 
-                                store_name: str) -> FAISS:
+                                store_name: str,
+                                index_factory: str = DEFAULT_INDEX_FACTORY) -> FAISS:
         """
         Load existing vector store or create new one if it doesn't exist
+        
+        Args:
+            text: Text to index when the store has to be created
+            store_name: Name of the store under vector_store_path
+            index_factory: FAISS index_factory string for new stores; the
+                default stores vectors as float16, larger corpora can use
+                compressed indices such as "IVF64,PQ16" or "OPQ32,IVF256,PQ32".
+                IVF/PQ indices need a few thousand chunks to train; smaller
+                stores fall back to the default
+        """
+        store_path = os.path.abspath(os.path.join(self.vector_store_path, store_name))
+        # A saved or cached store is reused only for the same text and index type
+        source_hash = hashlib.blake2b(f"{index_factory}\0{text}".encode()).hexdigest()
+        
+        vector_store = self._cached_store(store_path, source_hash)
+        if vector_store is not None:
+            return vector_store
+        
+        # Two callers never write the same store; check again in case one just built it
+        with self._store_path_lock(store_path):
+            vector_store = self._cached_store(store_path, source_hash)
+            if vector_store is not None:
+                return vector_store
+            
+            vector_store = self._load_or_create_vector_store(text, source_hash, store_path, index_factory)
+            with _store_lock:
+                _store_cache[store_path] = (source_hash, vector_store)
+                _store_cache.move_to_end(store_path)
+                while len(_store_cache) > MAX_CACHED_STORES:
+                    _store_cache.popitem(last=False)
+            return vector_store
+    
+    def _cached_store(self, store_path: str, source_hash: str) -> Optional[FAISS]:
+        """
+        Return the live store for store_path if it was built from source_hash
+        """
+        with _store_lock:
+            cached = _store_cache.get(store_path)
+            if cached is None or cached[0] != source_hash:
+                return None
+            _store_cache.move_to_end(store_path)
+            return cached[1]
+    
+    def _store_path_lock(self, store_path: str) -> threading.Lock:
+        """
+        Return the lock serializing loads and builds of one store path
+        """
+        with _store_lock:
+            return _store_path_locks.setdefault(store_path, threading.Lock())
+    
+    def invalidate(self, store_name: str) -> None:
+        """
+        Drop a vector store from memory and disk so the next
+        load_or_create_vector_store call rebuilds it; stores are already
+        rebuilt automatically when their text changes
+        """
+        store_path = os.path.abspath(os.path.join(self.vector_store_path, store_name))
+        with self._store_path_lock(store_path):
+            with _store_lock:
+                _store_cache.pop(store_path, None)
+            shutil.rmtree(store_path, ignore_errors=True)
+    
+    def _load_or_create_vector_store(self,
+                                text: str,
+                                source_hash: str,
+                                store_path: str,
+                                index_factory: str) -> FAISS:
+        """
+        Load the vector store from disk if it was built from the same text
+        and index_factory, otherwise build and save it
         """
-        store_path = os.path.join(self.vector_store_path, store_name)
+        hash_path = os.path.join(store_path, "source.hash")
+        
         # Try to load existing vector store
-        if os.path.exists(store_path):
+        if os.path.exists(hash_path):
             try:
-                return FAISS.load_local(store_path, self.embeddings, allow_dangerous_deserialization=True)
+                with open(hash_path, encoding="utf-8") as f:
+                    if f.read() != source_hash:
+                        raise ValueError("store was built from different text or index type")
+                
+                # Memory-map the index (IO_FLAG_MMAP_IFC covers flat codes and
+                # HNSW, not only IVF lists) and read chunk text from disk on lookup
+                index = faiss.read_index(
+                    os.path.join(store_path, INDEX_FILE),
+                    faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+                )
+                # Stores scored as L2 distances can't be read as cosine similarity
+                if index.metric_type != faiss.METRIC_INNER_PRODUCT:
+                    raise ValueError("index does not use the inner product metric")
+                self._tune_index(index)
+                vector_store = self._open_vector_store(store_path, index, source_hash)
+                if index.ntotal != len(vector_store.docstore):
+                    raise ValueError("index and chunk text are out of sync")
+                return vector_store
             except Exception as e:
                 print(f"Error loading vector store: {e}")
                 # If loading fails, we'll create a new one
         
         # Create new vector store
         chunks = self.text_splitter.split_text(text)
-        documents = [Document(page_content=chunk) for chunk in chunks]
-        vector_store = FAISS.from_documents(documents, self.embeddings)
+        vectors = np.asarray(self.embeddings.embed_documents(chunks), dtype="float32")
+        
+        # Search by inner product on normalized vectors (cosine similarity)
+        faiss.normalize_L2(vectors)
+        try:
+            index = self._build_index(vectors, index_factory)
+        except RuntimeError as e:
+            # IVF/PQ clustering fails when there are too few chunks to train on
+            print(f"Error building {index_factory} index, using {DEFAULT_INDEX_FACTORY}: {e}")
+            index = self._build_index(vectors, DEFAULT_INDEX_FACTORY)
         
-        # Save vector store
-        os.makedirs(self.vector_store_path, exist_ok=True)
-        vector_store.save_local(store_path)
+        # Save the index and the chunk text blob side by side. Files are
+        # replaced rather than overwritten so older stores still mapping them
+        # keep reading the previous contents. The old hash is removed first
+        # and the new one written last, so an interrupted save is rebuilt
+        os.makedirs(store_path, exist_ok=True)
+        try:
+            os.remove(hash_path)
+        except FileNotFoundError:
+            pass
+        index_path = os.path.join(store_path, INDEX_FILE)
+        faiss.write_index(index, index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        DiskDocstore.write(store_path, chunks)
+        with open(hash_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(source_hash)
+        os.replace(hash_path + ".tmp", hash_path)
         
+        return self._open_vector_store(store_path, index, source_hash)
+    
+    def _open_vector_store(self, store_path: str, index: faiss.Index, source_hash: str) -> FAISS:
+        """
+        Wrap a FAISS index and the chunk text saved next to it as a vector store
+        """
+        vector_store = FAISS(
+            self.embeddings,
+            index,
+            DiskDocstore(store_path),
+            self._index_to_docstore_id(index),
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+        with _store_token_lock:
+            _store_tokens[vector_store] = (store_path, source_hash)
         return vector_store
     
+    def _index_to_docstore_id(self, index: faiss.Index) -> Dict[int, str]:
+        """
+        Map FAISS positions to docstore ids for stores saved by this class
+        """
+        return {i: str(i) for i in range(index.ntotal)}
+    
+    def _build_index(self, vectors: np.ndarray, index_factory: str) -> faiss.Index:
+        """
+        Build, train and fill an inner-product index from normalized vectors
+        """
+        index = faiss.index_factory(vectors.shape[1], index_factory, faiss.METRIC_INNER_PRODUCT)
+        base = self._base_index(index)
+        if isinstance(base, faiss.IndexHNSW):
+            base.hnsw.efConstruction = 80
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        self._tune_index(index)
+        return index
+    
+    def _base_index(self, index: faiss.Index) -> faiss.Index:
+        """
+        Unwrap transforms such as OPQ to reach the index doing the search
+        """
+        while isinstance(index, faiss.IndexPreTransform):
+            index = faiss.downcast_index(index.index)
+        return index
+    
+    def _tune_index(self, index: faiss.Index) -> None:
+        """
+        Set query-time search parameters on a FAISS index
+        """
+        base = self._base_index(index)
+        if isinstance(base, faiss.IndexHNSW):
+            base.hnsw.efSearch = 32
+        elif isinstance(base, faiss.IndexIVF):
+            base.nprobe = 8
+    
     def get_relevant_context(self, 
                         vector_store: FAISS, 
                         query: str,
@@ -63,47 +334,140 @@ class GroqCoverLetterGenerator:
         """
         Get relevant context from vector store using similarity search
         """
-        documents = vector_store.similarity_search(query, k=k)
-        return "\n".join([doc.page_content for doc in documents])
+        return self.get_relevant_contexts(vector_store, [query], k=k)[0]
     
-    def extract_key_information(self, 
-                            resume_store: FAISS, 
-                            jd_store: FAISS) -> Dict[str, str]:
+    def get_relevant_contexts(self, 
+                        vector_store: FAISS, 
+                        queries: List[str],
+                        k: int = 3) -> List[str]:
         """
-        Extract relevant information from both resume and job description
-        using vector stores
+        Get relevant context for several queries at once, embedding all
+        queries in a single batch and running one FAISS search
         """
-        queries = {
-            "technical_skills": "What are the candidate's technical skills, programming languages, and tools?",
-            "soft_skills": "What are the candidate's soft skills, leadership abilities, and interpersonal skills?",
-            "experience": "What are the candidate's most relevant work experiences, projects, and achievements?",
-            "education": "What is the candidate's educational background, degrees, and certifications?",
-            "job_requirements": "What are the key technical requirements and qualifications for this position?",
-            "job_responsibilities": "What are the main responsibilities and duties of this role?"
-        }
+        token = _store_token(vector_store)
+        keys = [(token, query, k) for query in queries]
+        contexts = [self._ctx_cache.get(key) for key in keys]
+        missing = [i for i, context in enumerate(contexts) if context is None]
+        if not missing:
+            return contexts
         
-        info = {}
+        query_vectors = self._embed_queries([queries[i] for i in missing])
+        for i, texts in zip(missing, self._search_texts(vector_store, query_vectors, k)):
+            contexts[i] = "\n".join(texts)
+            self._ctx_cache.set(keys[i], contexts[i])
+        return contexts
+    
+    def _search_texts(self,
+                    vector_store: FAISS,
+                    query_vectors: np.ndarray,
+                    k: int) -> List[List[str]]:
+        """
+        Search the store with a (n, d) query matrix and return the text of
+        the top k chunks for each query
+        """
+        _, indices = vector_store.index.search(query_vectors, k)
+        
+        # FAISS pads with -1 when the store holds fewer than k chunks
+        docstore = vector_store.docstore
+        if isinstance(docstore, DiskDocstore):
+            # FAISS positions are chunk positions in the text blob
+            return [[docstore.get_doc(j) for j in row if j != -1] for row in indices]
         
-        # Extract from resume
-        for key in ['technical_skills', 'soft_skills', 'experience', 'education']:
-            info[key] = self.get_relevant_context(resume_store, queries[key])
+        # Stores not built by this class, e.g. from FAISS.from_texts. Their
+        # docstore returns a "not found" string for missing ids, which is skipped
+        results = []
+        for row in indices:
+            documents = [docstore.search(vector_store.index_to_docstore_id[j]) for j in row if j != -1]
+            results.append([doc.page_content for doc in documents if isinstance(doc, Document)])
+        return results
+    
+    @classmethod
+    @functools.lru_cache(maxsize=4)
+    def _get_query_matrix(cls, embedder: MPNetEmbeddings) -> np.ndarray:
+        """
+        Embed the fixed extraction queries once per embedder as an
+        L2-normalized (len(_QUERIES), d) matrix
+        """
+        matrix = np.asarray(embedder.embed_documents(list(cls._QUERIES.values())), dtype="float32")
+        faiss.normalize_L2(matrix)
+        return matrix
+    
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed queries as an L2-normalized float32 (n, d) matrix, only
+        running the model for queries whose embedding is not cached
+        """
+        keys = [hashlib.blake2b(query.encode()).digest() for query in queries]
+        vectors = [self._embed_cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
         
-        # Extract from job description
-        for key in ['job_requirements', 'job_responsibilities']:
-            info[key] = self.get_relevant_context(jd_store, queries[key])
+        if missing:
+            embedded = self.embeddings.embed_documents([queries[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = np.asarray(vector, dtype="float32")
+                self._embed_cache.set(keys[i], vectors[i])
         
+        query_vectors = np.vstack(vectors)
+        faiss.normalize_L2(query_vectors)
+        return query_vectors
+    
+    async def extract_key_information(self, 
+                            resume_store: FAISS, 
+                            jd_store: FAISS) -> Dict[str, str]:
+        """
+        Extract relevant information from both resume and job description
+        using vector stores, searching both stores concurrently
+        """
+        info, _ = await self.retrieve_all(resume_store, jd_store)
         return info
     
-    def generate_cover_letter(self,
+    async def retrieve_all(self,
+                        resume_store: FAISS,
+                        jd_store: FAISS) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+        """
+        Run every fixed query with one search per store, returning the
+        joined top 3 chunks per query for the prompt and the top 5 chunks
+        per query for match scoring
+        
+        Pass the results to generate_cover_letter(info=...) and
+        calculate_match_scores(top=...) to serve both from this search.
+        """
+        # FAISS search blocks, so run both stores in the default executor
+        loop = asyncio.get_running_loop()
+        resume_top, jd_top = await asyncio.gather(
+            loop.run_in_executor(None, self._top_chunks, resume_store, self._RESUME_KEYS),
+            loop.run_in_executor(None, self._top_chunks, jd_store, self._JD_KEYS)
+        )
+        
+        top = {**resume_top, **jd_top}
+        info = {key: "\n".join(texts[:3]) for key, texts in top.items()}
+        return info, top
+    
+    def _top_chunks(self, vector_store: FAISS, keys: List[str]) -> Dict[str, List[str]]:
+        """
+        Get the top _RETRIEVE_K chunks for the given fixed queries
+        """
+        query_names = list(self._QUERIES)
+        rows = [query_names.index(key) for key in keys]
+        query_vectors = self._get_query_matrix(self.embeddings)[rows]
+        return dict(zip(keys, self._search_texts(vector_store, query_vectors, self._RETRIEVE_K)))
+    
+    async def generate_cover_letter(self,
                             resume_store: FAISS,
                             jd_store: FAISS,
-                            hr_email: str) -> Optional[str]:
+                            hr_email: str,
+                            info: Optional[Dict[str, str]] = None) -> AsyncIterator[str]:
         """
-        Generate cover letter using existing vector stores
+        Generate cover letter using existing vector stores, yielding the
+        text as it is streamed from Groq
+        
+        Args:
+            info: Context already returned by retrieve_all, if any
         """
         try:
             # Extract relevant information using vector stores
-            info = self.extract_key_information(resume_store, jd_store)
+            if info is None:
+                info, _ = await self.retrieve_all(resume_store, jd_store)
             
             # Create detailed prompt with extracted information
             messages = [
@@ -159,44 +523,67 @@ class GroqCoverLetterGenerator:
             ]
             
             # Generate completion using Groq
-            completion = self.client.chat.completions.create(
+            stream = await self.client.chat.completions.create(
                 messages=messages,
                 model="llama3-70b-8192",
                 temperature=0.7,
                 max_tokens=1000,
                 top_p=1,
-                stream=False
+                stream=True
             )
             
-            return completion.choices[0].message.content
+            async for chunk in stream:
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
             
         except Exception as e:
             print(f"Error generating cover letter: {str(e)}")
-            return None
+            raise
 
     def calculate_match_scores(self,
                             resume_store: FAISS,
-                            jd_store: FAISS) -> Dict[str, float]:
+                            jd_store: FAISS,
+                            top: Optional[Dict[str, List[str]]] = None) -> Dict[str, float]:
         """
         Calculate how well the resume matches job requirements
+        
+        Args:
+            top: Top chunks already returned by retrieve_all, if any
         """
         # Get key requirements
-        requirements = self.get_relevant_context(
-            jd_store,
-            "What are the specific requirements and qualifications?",
-            k=5
-        )
+        if top is None:
+            top = self._top_chunks(jd_store, self._JD_KEYS)
+        requirements = "\n".join(top["job_requirements"])
         
         # Split into individual requirements
-        req_chunks = self.text_splitter.split_text(requirements)
-        
-        scores = {}
-        for req in req_chunks:
-            # Find most relevant resume content
-            matches = resume_store.similarity_search_with_score(req, k=1)
-            if matches:
-                # Convert distance to similarity score (0-100%)
-                score = (1.0 - matches[0][1]) * 100
-                scores[req.strip()] = round(score, 2)
-        
-        return scores
+        req_chunks = list(_split(requirements))
+        
+        if not req_chunks:
+            return {}
+        
+        # Find most relevant resume content for all requirements in one search
+        query_vectors = self._embed_queries(req_chunks)
+        similarities, indices = resume_store.index.search(query_vectors, 1)
+        matched = indices[:, 0] != -1
+        similarities = similarities[matched, 0].astype(np.float64)
+        
+        # Only stores built by this class search by inner product on normalized
+        # vectors. Others (e.g. FAISS.from_texts) return L2 distances or raw
+        # inner products, so recompute cosine similarity from the matched vectors
+        if not (isinstance(resume_store.docstore, DiskDocstore)
+                and resume_store.index.metric_type == faiss.METRIC_INNER_PRODUCT) and matched.any():
+            try:
+                doc_vectors = np.vstack([
+                    resume_store.index.reconstruct(int(j)) for j in indices[matched, 0]
+                ]).astype("float32")
+            except RuntimeError as e:
+                raise ValueError(f"Cannot compute match scores for this vector store: {e}") from e
+            faiss.normalize_L2(doc_vectors)
+            similarities = np.sum(query_vectors[matched] * doc_vectors, axis=1).astype(np.float64)
+        
+        # Map cosine similarity [-1, 1] to a score (0-100%), skipping requirements without a match
+        scores = np.round((similarities + 1.0) * 50.0, 2)
+        reqs = [req.strip() for req, has_match in zip(req_chunks, matched) if has_match]
+        
+        return dict(zip(reqs, scores.tolist()))
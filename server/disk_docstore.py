@@ -0,0 +1,61 @@
+from typing import List, Union
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+import mmap
+import numpy as np
+import os
+
+class DiskDocstore(Docstore):
+    def __init__(self, path: str):
+        """
+        Open a read-only docstore that keeps all chunk text in one
+        memory-mapped UTF-8 blob, addressed by an offsets array
+
+        Args:
+            path: Directory holding text.bin and offs.npy written by DiskDocstore.write
+        """
+        self.path = path
+        self._offsets = np.load(os.path.join(path, "offs.npy"))
+
+        with open(os.path.join(path, "text.bin"), "rb") as f:
+            # mmap can't map an empty file
+            if os.fstat(f.fileno()).st_size:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._blob = b""
+
+    @staticmethod
+    def write(path: str, texts: List[str]) -> None:
+        """
+        Write chunk texts as a concatenated blob plus their byte offsets,
+        replacing existing files so open docstores keep their mapped data
+        """
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.cumsum([0] + [len(chunk) for chunk in encoded], dtype=np.int64)
+
+        blob_path = os.path.join(path, "text.bin")
+        with open(blob_path + ".tmp", "wb") as f:
+            f.write(b"".join(encoded))
+        os.replace(blob_path + ".tmp", blob_path)
+
+        offsets_path = os.path.join(path, "offs.npy")
+        with open(offsets_path + ".tmp", "wb") as f:
+            np.save(f, offsets)
+        os.replace(offsets_path + ".tmp", offsets_path)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get_doc(self, i: int) -> str:
+        """Return the text of chunk i"""
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].decode("utf-8")
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Return the document stored under the given id (its chunk position)"""
+        try:
+            i = int(search)
+        except ValueError:
+            return f"ID {search} not found."
+        if not 0 <= i < len(self):
+            return f"ID {search} not found."
+        return Document(page_content=self.get_doc(i))
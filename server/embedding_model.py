@@ -0,0 +1,89 @@
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+from transformers import AutoModel, AutoTokenizer, BitsAndBytesConfig
+import importlib.util
+import torch
+import torch.nn.functional as F
+
+class MPNetEmbeddings(Embeddings):
+    def __init__(self,
+                model_name: str = "sentence-transformers/all-mpnet-base-v2",
+                dtype: torch.dtype = torch.bfloat16,
+                device: Optional[str] = None,
+                batch_size: int = 32,
+                max_length: int = 384,
+                quantize: bool = False):
+        """
+        Initialize a mean-pooling sentence embedder with weights loaded in
+        the given dtype
+
+        Args:
+            model_name: HuggingFace model to load
+            dtype: Dtype the encoder weights are loaded in
+            device: Torch device, defaults to CUDA when available
+            batch_size: Number of texts per forward pass
+            max_length: Maximum number of tokens per text
+            quantize: Use int8 weights; dynamic quantization of the Linear
+                layers on CPU, bitsandbytes on CUDA when it is installed
+        """
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if quantize and self.device.type == "cpu":
+            # Dynamic quantization needs fp32 weights to start from
+            model = AutoModel.from_pretrained(model_name, torch_dtype=torch.float32)
+            self.model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif quantize and importlib.util.find_spec("bitsandbytes") is not None:
+            self.model = AutoModel.from_pretrained(
+                model_name,
+                quantization_config=BitsAndBytesConfig(load_in_8bit=True),
+                torch_dtype=torch.float16,
+                device_map={"": self.device.index or 0}
+            )
+        else:
+            self.model = AutoModel.from_pretrained(model_name, torch_dtype=dtype).to(self.device)
+        self.model.eval()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, returning L2-normalized vectors
+        """
+        if not texts:
+            return []
+
+        # Tokenize all texts in a single call, then slice into batches
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="pt"
+        )
+
+        vectors = []
+        for input_ids, attention_mask in zip(
+            torch.split(encoded["input_ids"], self.batch_size),
+            torch.split(encoded["attention_mask"], self.batch_size)
+        ):
+            # Drop padding columns beyond the longest text in this batch
+            length = int(attention_mask.sum(dim=1).max())
+            input_ids = input_ids[:, :length].to(self.device)
+            attention_mask = attention_mask[:, :length].to(self.device)
+
+            # Run the encoder in its native dtype, then pool and normalize in fp32
+            with torch.inference_mode(), torch.autocast(device_type=self.device.type, enabled=False):
+                hidden = self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state.float()
+
+            mask = attention_mask.unsqueeze(-1).float()
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            vectors.append(F.normalize(pooled, p=2, dim=1).cpu())
+
+        return torch.cat(vectors).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a single query text
+        """
+        return self.embed_documents([text])[0]
@@ -0,0 +1,46 @@
+from collections import OrderedDict
+from threading import RLock
+from typing import Any, Hashable, Optional
+import time
+
+class QueryCache:
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 600):
+        """
+        Initialize a thread-safe LRU cache whose entries expire after a TTL
+
+        Args:
+            max_size: Maximum number of entries kept before evicting the least recently used
+            ttl_seconds: Seconds an entry stays valid after it is set
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Cache value under key, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()